@@ -5,6 +5,9 @@ Uses Pydantic Settings for type-safe configuration with .env file support.
 All generation parameters are centralized here for easy tuning.
 """
 
+from functools import cached_property, lru_cache
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
 
@@ -15,6 +18,9 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     environment: str = "development"
+    # Uvicorn worker processes outside development; 0 = auto (half the CPUs, min 2).
+    # Each worker loads its own copy of the Magenta models, so lower this if RAM-bound.
+    workers: int = 0
 
     # Claude API
     anthropic_api_key: str = ""
@@ -44,10 +50,16 @@ class Settings(BaseSettings):
     drums_temperature: float = 0.9
     piano_temperature: float = 0.8
     steps_per_bar: int = 16  # 16th note resolution
+    # Max simultaneous Magenta generations per worker (0 would block every request)
+    generation_concurrency: int = Field(default=1, ge=1)
 
     # Output
     output_dir: str = "output"
 
+    # Result cache (optional, requires `pip install redis`; empty = disabled)
+    redis_url: str = ""  # e.g. redis://localhost:6379/0
+    cache_ttl_seconds: int = 86400
+
     # CORS
     cors_origins: str = "*"  # Comma-separated origins, or * for all
 
@@ -56,11 +68,17 @@ class Settings(BaseSettings):
         "case_sensitive": False,
     }
 
-    @property
+    @cached_property
     def cors_origin_list(self) -> list[str]:
         if self.cors_origins == "*":
             return ["*"]
         return [o.strip() for o in self.cors_origins.split(",")]
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide Settings, parsing the environment / .env only once."""
+    return Settings()
+
+
+settings = get_settings()
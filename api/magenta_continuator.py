@@ -9,23 +9,28 @@ jazz-styled primer will produce a jazz-styled continuation.
 Models are loaded once at startup and kept in memory for fast generation.
 """
 
+import asyncio
+import functools
+import importlib.util
+import io
 import logging
+import mmap
 import os
 import time
-from typing import Optional
+from operator import itemgetter
+from typing import TYPE_CHECKING, Optional
 
 from config import settings
 
-# note_seq and protobuf are optional — the server can start without them
-# but generation will fail gracefully if they're missing
-try:
-    import note_seq
+if TYPE_CHECKING:
     from note_seq.protobuf import music_pb2
-    _NOTE_SEQ_AVAILABLE = True
+
+# Magenta's generator options proto — imported once here rather than per
+# request
+try:
+    from magenta.protobuf import generator_pb2
 except ImportError:
-    note_seq = None
-    music_pb2 = None
-    _NOTE_SEQ_AVAILABLE = False
+    generator_pb2 = None
 
 logger = logging.getLogger(__name__)
 
@@ -45,8 +50,43 @@ def _seconds_to_beats(seconds: float, tempo: int) -> float:
     return seconds * tempo / 60.0
 
 
+@functools.lru_cache(maxsize=1)
+def _get_note_seq():
+    """Import note_seq on first use.
+
+    note_seq and protobuf are optional — the server can start without them
+    but generation will fail gracefully if they're missing. The import is
+    deferred because note_seq drags in a large dependency tree; workers that
+    only ever use the mido fallback never pay for it.
+
+    Returns:
+        (note_seq, music_pb2), or (None, None) if note_seq isn't installed.
+    """
+    try:
+        import note_seq
+        from note_seq.protobuf import music_pb2
+    except ImportError:
+        return None, None
+    return note_seq, music_pb2
+
+
 # --- Model Loading ---
 
+def _read_bundle_mmap(bundle_path: str):
+    """Parse a .mag generator bundle straight from a memory-mapped file.
+
+    Equivalent to sequence_generator_bundle.read_bundle_file(), but pages are
+    faulted in on demand and stay in the OS page cache across worker reloads
+    instead of being copied through a Python bytes buffer first.
+    """
+    bundle = generator_pb2.GeneratorBundle()
+    with open(bundle_path, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                bundle.ParseFromString(view)
+    return bundle
+
+
 def load_drums_rnn(checkpoint_path: str = None) -> bool:
     """Load the DrumsRNN model from a .mag bundle.
 
@@ -70,12 +110,11 @@ def load_drums_rnn(checkpoint_path: str = None) -> bool:
 
     try:
         from magenta.models.drums_rnn import drums_rnn_sequence_generator
-        from magenta.models.shared import sequence_generator_bundle
 
         logger.info(f"Loading DrumsRNN from {checkpoint_path}...")
         start = time.time()
 
-        bundle = sequence_generator_bundle.read_bundle_file(checkpoint_path)
+        bundle = _read_bundle_mmap(checkpoint_path)
         generator_map = drums_rnn_sequence_generator.get_generator_map()
         _drums_rnn_model = generator_map["drum_kit"](checkpoint=None, bundle=bundle)
         _drums_rnn_model.initialize()
@@ -137,19 +176,28 @@ def load_music_transformer(checkpoint_path: str = None) -> bool:
         return False
 
 
-def load_all_models() -> dict:
-    """Load all Magenta models at startup. Returns status dict."""
+async def load_all_models_async() -> dict:
+    """Load all Magenta models concurrently at startup. Returns status dict.
+
+    Each model is deserialized in its own worker thread, so startup takes
+    as long as the slowest model rather than the sum of both. Each loader
+    only writes its own module global, so no locking is needed.
+    """
     global _models_loaded
 
-    if not _NOTE_SEQ_AVAILABLE:
+    if importlib.util.find_spec("note_seq") is None:
         logger.warning(
             "note-seq not installed. Install with: pip install note-seq\n"
             "MIDI generation will use the mido fallback (primer only, no Magenta continuation)."
         )
 
+    drums_ok, transformer_ok = await asyncio.gather(
+        asyncio.to_thread(load_drums_rnn),
+        asyncio.to_thread(load_music_transformer),
+    )
     status = {
-        "drums_rnn": load_drums_rnn(),
-        "music_transformer": load_music_transformer(),
+        "drums_rnn": drums_ok,
+        "music_transformer": transformer_ok,
     }
     _models_loaded = any(status.values())
 
@@ -157,6 +205,11 @@ def load_all_models() -> dict:
     return status
 
 
+def load_all_models() -> dict:
+    """Synchronous wrapper around load_all_models_async() for scripts / CLI use."""
+    return asyncio.run(load_all_models_async())
+
+
 def models_status() -> dict:
     """Return current model loading status."""
     return {
@@ -178,39 +231,46 @@ def _drum_notes_to_sequence(notes: list[dict], tempo: int):
         notes: List of dicts with keys: midi_note, time, velocity
         tempo: BPM
     """
-    if _NOTE_SEQ_AVAILABLE:
+    sec_per_beat = 60.0 / tempo  # hoisted out of the per-note loops
+
+    _, music_pb2 = _get_note_seq()
+    if music_pb2 is not None:
         seq = music_pb2.NoteSequence()
         seq.tempos.add(qpm=tempo)
         seq.ticks_per_quarter = 480
 
-        for note in notes:
-            start_seconds = _beats_to_seconds(note["time"], tempo)
-            end_seconds = start_seconds + 0.05  # Drum hits are short
-
-            ns_note = seq.notes.add()
-            ns_note.pitch = note["midi_note"]
-            ns_note.start_time = start_seconds
-            ns_note.end_time = end_seconds
-            ns_note.velocity = note["velocity"]
-            ns_note.is_drum = True
-            ns_note.instrument = 9  # GM drum channel
-
-        if seq.notes:
-            seq.total_time = max(n.end_time for n in seq.notes)
+        # Build all Note messages up front and append them in one extend()
+        # call rather than seq.notes.add() plus six field writes per note.
+        Note = music_pb2.NoteSequence.Note
+        seq.notes.extend([
+            Note(
+                pitch=note["midi_note"],
+                start_time=note["time"] * sec_per_beat,
+                end_time=note["time"] * sec_per_beat + 0.05,  # Drum hits are short
+                velocity=note["velocity"],
+                is_drum=True,
+                instrument=9,  # GM drum channel
+            )
+            for note in notes
+        ])
+
+        if notes:
+            seq.total_time = max(note["time"] for note in notes) * sec_per_beat + 0.05
         return seq
 
     # Fallback without note_seq
     seq = FallbackSequence(tempo)
-    for note in notes:
-        start_seconds = _beats_to_seconds(note["time"], tempo)
-        seq.add_note(
-            pitch=note["midi_note"],
-            start_time=start_seconds,
-            end_time=start_seconds + 0.05,
-            velocity=note["velocity"],
-            is_drum=True,
-            instrument=9,
+    seq.extend_notes([
+        _FallbackNote(
+            note["midi_note"],
+            note["time"] * sec_per_beat,
+            note["time"] * sec_per_beat + 0.05,
+            note["velocity"],
+            True,
+            9,
         )
+        for note in notes
+    ])
     return seq
 
 
@@ -224,40 +284,44 @@ def _piano_notes_to_sequence(notes: list[dict], tempo: int):
         notes: List of dicts with keys: pitch, time, duration, velocity
         tempo: BPM
     """
-    if _NOTE_SEQ_AVAILABLE:
+    sec_per_beat = 60.0 / tempo  # hoisted out of the per-note loops
+
+    _, music_pb2 = _get_note_seq()
+    if music_pb2 is not None:
         seq = music_pb2.NoteSequence()
         seq.tempos.add(qpm=tempo)
         seq.ticks_per_quarter = 480
 
-        for note in notes:
-            start_seconds = _beats_to_seconds(note["time"], tempo)
-            end_seconds = start_seconds + _beats_to_seconds(note["duration"], tempo)
-
-            ns_note = seq.notes.add()
-            ns_note.pitch = note["pitch"]
-            ns_note.start_time = start_seconds
-            ns_note.end_time = end_seconds
-            ns_note.velocity = note["velocity"]
-            ns_note.is_drum = False
-            ns_note.instrument = 0
-
-        if seq.notes:
+        Note = music_pb2.NoteSequence.Note
+        seq.notes.extend([
+            Note(
+                pitch=note["pitch"],
+                start_time=note["time"] * sec_per_beat,
+                end_time=(note["time"] + note["duration"]) * sec_per_beat,
+                velocity=note["velocity"],
+                is_drum=False,
+                instrument=0,
+            )
+            for note in notes
+        ])
+
+        if notes:
             seq.total_time = max(n.end_time for n in seq.notes)
         return seq
 
     # Fallback without note_seq
     seq = FallbackSequence(tempo)
-    for note in notes:
-        start_seconds = _beats_to_seconds(note["time"], tempo)
-        end_seconds = start_seconds + _beats_to_seconds(note["duration"], tempo)
-        seq.add_note(
-            pitch=note["pitch"],
-            start_time=start_seconds,
-            end_time=end_seconds,
-            velocity=note["velocity"],
-            is_drum=False,
-            instrument=0,
+    seq.extend_notes([
+        _FallbackNote(
+            note["pitch"],
+            note["time"] * sec_per_beat,
+            (note["time"] + note["duration"]) * sec_per_beat,
+            note["velocity"],
+            False,
+            0,
         )
+        for note in notes
+    ])
     return seq
 
 
@@ -269,7 +333,7 @@ def continue_drums(
     primer_bars: int,
     tempo: int,
     temperature: float = None,
-) -> Optional[music_pb2.NoteSequence]:
+) -> Optional["music_pb2.NoteSequence"]:
     """Generate drum continuation using DrumsRNN.
 
     Takes primer notes (from Claude + post-processing) and extends them
@@ -305,8 +369,6 @@ def continue_drums(
     )
 
     try:
-        from magenta.protobuf import generator_pb2
-
         # Build generation request
         gen_options = generator_pb2.GeneratorOptions()
         gen_options.args["temperature"].float_value = temperature
@@ -336,7 +398,7 @@ def continue_piano(
     primer_bars: int,
     tempo: int,
     temperature: float = None,
-) -> Optional[music_pb2.NoteSequence]:
+) -> Optional["music_pb2.NoteSequence"]:
     """Generate piano continuation using Music Transformer.
 
     Args:
@@ -382,18 +444,22 @@ def continue_piano(
         return primer_seq  # Return primer as fallback
 
 
-def sequence_to_midi_file(sequence, output_path: str) -> str:
-    """Write a NoteSequence to a MIDI file.
+def sequence_to_midi_bytes(sequence) -> bytes:
+    """Render a NoteSequence to Standard MIDI File bytes in memory.
 
     Uses note_seq if available, falls back to mido for lightweight MIDI writing.
+    Nothing touches the disk; callers decide whether to persist the bytes.
     """
-    if _NOTE_SEQ_AVAILABLE and hasattr(sequence, 'notes'):
-        note_seq.sequence_proto_to_midi_file(sequence, output_path)
+    buf = io.BytesIO()
+    note_seq, _ = _get_note_seq()
+    if note_seq is not None and hasattr(sequence, 'notes'):
+        note_seq.sequence_proto_to_pretty_midi(sequence).write(buf)
     else:
-        _write_midi_with_mido(sequence, output_path)
+        _write_midi_with_mido(sequence, buf)
 
-    logger.info(f"MIDI file written to {output_path}")
-    return output_path
+    midi_bytes = buf.getvalue()
+    logger.info(f"MIDI rendered ({len(midi_bytes)} bytes)")
+    return midi_bytes
 
 
 def primer_only_to_sequence(
@@ -414,11 +480,15 @@ def primer_only_to_sequence(
 
 # --- Fallback MIDI writer using mido (no tensorflow dependency) ---
 
-def _write_midi_with_mido(sequence, output_path: str):
+def _write_midi_with_mido(sequence, output):
     """Write a NoteSequence-like object to MIDI using mido.
 
     This is the fallback path when note_seq isn't installed.
     Works with both NoteSequence protobufs and our FallbackSequence.
+
+    Args:
+        sequence: NoteSequence or FallbackSequence
+        output: File path, or a writable binary file object (e.g. io.BytesIO)
     """
     import mido
 
@@ -439,16 +509,16 @@ def _write_midi_with_mido(sequence, output_path: str):
     events = []
     notes = sequence.notes if hasattr(sequence, 'notes') else []
 
-    for n in notes:
-        start_tick = int(n.start_time / 60 * tempo_bpm * 480) if hasattr(n, 'start_time') else 0
-        end_tick = int(n.end_time / 60 * tempo_bpm * 480) if hasattr(n, 'end_time') else start_tick + 240
-        channel = 9 if (hasattr(n, 'is_drum') and n.is_drum) else 0
-        velocity = n.velocity if hasattr(n, 'velocity') else 80
+    # seconds / 60 * bpm * 480 ticks-per-beat, folded into one multiplier
+    ticks_per_second = tempo_bpm * 8.0
 
-        events.append((start_tick, 'note_on', n.pitch, velocity, channel))
-        events.append((end_tick, 'note_off', n.pitch, 0, channel))
+    for n in notes:
+        channel = 9 if n.is_drum else 0
+        events.append((int(n.start_time * ticks_per_second), 'note_on', n.pitch, n.velocity, channel))
+        events.append((int(n.end_time * ticks_per_second), 'note_off', n.pitch, 0, channel))
 
-    events.sort(key=lambda e: e[0])
+    # Stable sort on the integer tick only (C-level key, no tuple comparisons)
+    events.sort(key=itemgetter(0))
 
     # Convert absolute ticks to delta ticks
     prev_tick = 0
@@ -457,11 +527,16 @@ def _write_midi_with_mido(sequence, output_path: str):
         track.append(mido.Message(msg_type, note=pitch, velocity=velocity, channel=channel, time=delta))
         prev_tick = tick
 
-    mid.save(output_path)
+    if isinstance(output, (str, os.PathLike)):
+        mid.save(output)
+    else:
+        mid.save(file=output)
 
 
 class _FallbackNote:
     """Minimal note object for when note_seq isn't available."""
+    __slots__ = ("pitch", "start_time", "end_time", "velocity", "is_drum", "instrument")
+
     def __init__(self, pitch, start_time, end_time, velocity, is_drum=False, instrument=0):
         self.pitch = pitch
         self.start_time = start_time
@@ -472,6 +547,8 @@ class _FallbackNote:
 
 
 class _FallbackTempo:
+    __slots__ = ("qpm",)
+
     def __init__(self, qpm):
         self.qpm = qpm
 
@@ -489,3 +566,10 @@ class FallbackSequence:
         note = _FallbackNote(pitch, start_time, end_time, velocity, is_drum, instrument)
         self.notes.append(note)
         self.total_time = max(self.total_time, end_time)
+
+    def extend_notes(self, notes: list):
+        """Append a batch of _FallbackNotes, updating total_time once."""
+        if not notes:
+            return
+        self.notes.extend(notes)
+        self.total_time = max(self.total_time, max(n.end_time for n in notes))
@@ -5,26 +5,37 @@ FastAPI application that orchestrates the full generation pipeline:
   User Request → Claude Primer → Post-Processing → Magenta Continuation → MIDI
 
 Endpoints:
-  POST /generate  - Generate music from a style prompt
-  GET  /health    - Check server and model status
+  POST /generate       - Generate music from a style prompt (MIDI as base64 JSON)
+  POST /generate/fast  - Same as /generate, single-pass request parsing
+  POST /generate/midi  - Same pipeline, returns the raw MIDI file
+  GET  /health         - Check server and model status
 """
 
+import asyncio
 import base64
 import logging
 import os
 import time
 import uuid
+import zlib
 from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Literal
 
+import fastapi
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
+from fastapi.middleware.gzip import GZipMiddleware
+from pydantic import BaseModel, Field, ValidationError
 
 from config import settings
 from primer_generator import generate_primer
 from post_processing import post_process
 import magenta_continuator as continuator
+import result_cache
 
 # --- Logging ---
 
@@ -45,10 +56,22 @@ class GenerateRequest(BaseModel):
     tempo: int = Field(default=120, ge=40, le=300, description="Tempo in BPM")
     temperature: float = Field(default=0.9, ge=0.1, le=2.0, description="Generation temperature")
     instrument: str = Field(default="piano", description="'drums', 'piano', or 'melody'")
+    use_cache: bool = Field(
+        default=False,
+        description="Reuse a stored result for an identical request instead of generating anew",
+    )
+    midi_encoding: Literal["base64", "zlib+base64"] = Field(
+        default="base64",
+        description=(
+            "'zlib+base64' deflates the MIDI before base64 "
+            "(~3x smaller; zlib-decompress after decoding)"
+        ),
+    )
 
 
 class GenerateResponse(BaseModel):
     midi_base64: str
+    midi_encoding: str = "base64"
     filename: str
     total_notes: int
     duration_seconds: float
@@ -94,9 +117,15 @@ async def lifespan(app: FastAPI):
             "The /generate endpoint will fail without it."
         )
 
+    # Connect the optional Redis result cache
+    if await result_cache.connect():
+        logger.info("Result cache: Redis")
+    else:
+        logger.info("Result cache: disabled (set REDIS_URL to enable)")
+
     # Load Magenta models (this takes 1-3 minutes)
     logger.info("Loading Magenta models (this may take a few minutes)...")
-    model_status = continuator.load_all_models()
+    model_status = await continuator.load_all_models_async()
 
     if not model_status.get("drums_rnn"):
         logger.warning("DrumsRNN not loaded — drum generation will return primer only")
@@ -111,15 +140,27 @@ async def lifespan(app: FastAPI):
     yield  # App runs here
 
     logger.info("Shutting down NextBeat API")
+    await result_cache.close()
 
 
 # --- App ---
 
+# FastAPI >= 0.130 serializes response models straight to JSON bytes through
+# Pydantic, but only for routes without a custom response class (and 0.131
+# deprecates ORJSONResponse). Older releases go through jsonable_encoder +
+# json.dumps, where orjson is much faster on the large midi_base64 strings.
+_app_options = {}
+if tuple(int(p) for p in fastapi.__version__.split(".")[:2]) < (0, 130):
+    from fastapi.responses import ORJSONResponse
+
+    _app_options["default_response_class"] = ORJSONResponse
+
 app = FastAPI(
     title="NextBeat Music Generation API",
     version="1.0.0",
     description="AI-powered music generation using Claude + Magenta",
     lifespan=lifespan,
+    **_app_options,
 )
 
 app.add_middleware(
@@ -128,31 +169,76 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let browser clients read the metadata headers sent by /generate/midi
+    expose_headers=[
+        "Content-Disposition",
+        "X-Total-Notes",
+        "X-Duration-Seconds",
+        "X-Primer-Notes",
+        "X-Generated-Notes",
+        "X-Instrument",
+        "X-Tempo",
+        "X-Bars",
+    ],
 )
 
 
-# --- Endpoints ---
+# Compress response bodies (the base64 MIDI JSON in particular) for clients
+# that send Accept-Encoding: gzip — browsers decode this transparently.
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-@app.get("/health", response_model=HealthResponse)
-async def health():
-    """Check server health, model status, and API connectivity."""
-    return HealthResponse(
-        status="ok",
-        models=continuator.models_status(),
-        claude_api="configured" if settings.anthropic_api_key else "missing",
-        version="1.0.0",
+
+# --- Helpers ---
+
+# Caps concurrent Magenta generations per worker process
+_generation_slots = asyncio.Semaphore(settings.generation_concurrency)
+
+
+def _save_midi(output_path: str, midi_bytes: bytes) -> None:
+    """Persist generated MIDI to the output directory (runs after the response is sent)."""
+    try:
+        Path(output_path).write_bytes(midi_bytes)
+        logger.info(f"MIDI file written to {output_path}")
+    except OSError as e:
+        logger.error(f"Failed to write MIDI file {output_path}: {e}")
+
+
+def _build_generate_response(
+    req: GenerateRequest,
+    midi_bytes: bytes,
+    metadata: dict,
+) -> GenerateResponse:
+    """Encode the MIDI per req.midi_encoding and wrap it in a GenerateResponse."""
+    if req.midi_encoding == "zlib+base64":
+        midi_bytes = zlib.compress(midi_bytes, 6)
+
+    return GenerateResponse(
+        midi_base64=base64.b64encode(midi_bytes).decode("utf-8"),
+        midi_encoding=req.midi_encoding,
+        **metadata,
     )
 
 
-@app.post("/generate", response_model=GenerateResponse)
-async def generate(req: GenerateRequest):
-    """Generate music from a style prompt.
+# --- Pipeline ---
+
+async def _run_pipeline(
+    req: GenerateRequest,
+    background_tasks: BackgroundTasks,
+) -> tuple[bytes, dict]:
+    """Run the full generation pipeline shared by the /generate endpoints.
 
     Full pipeline:
     1. Claude generates a style-appropriate primer (2 bars)
     2. Post-processing refines timing, applies swing/groove, humanizes
     3. Magenta model continues the primer to full length
-    4. Result converted to MIDI and returned as base64
+    4. Result rendered to MIDI bytes
+
+    Every blocking step (Claude HTTP call, TensorFlow generation, MIDI
+    writing) runs in the threadpool so the event loop stays responsive.
+
+    Returns:
+        (midi_bytes, metadata) where metadata holds every GenerateResponse
+        field except the MIDI payload itself.
     """
     request_id = uuid.uuid4().hex[:8]
     logger.info(
@@ -176,12 +262,26 @@ async def generate(req: GenerateRequest):
     # Ensure primer is shorter than total
     primer_bars = min(req.primer_bars, req.bars)
 
+    # Generation is random at every step (Claude sampling, humanize/ghost
+    # notes, Magenta temperature), so a repeated request normally yields a
+    # new piece. Clients opt in with use_cache to get the stored one back.
+    # The MIDI encoding is applied per response, so it isn't part of the key
+    cache_params = req.model_dump(exclude={"midi_encoding", "use_cache"})
+    if req.use_cache:
+        cached = await result_cache.get(cache_params)
+        if cached is not None:
+            logger.info(
+                f"[{request_id}] Result cache hit ({time.time() - pipeline_start:.2f}s)"
+            )
+            return cached
+
     # --- Step 1: Generate primer with Claude ---
     try:
         logger.info(f"[{request_id}] Step 1: Generating primer with Claude...")
         step_start = time.time()
 
-        primer = generate_primer(
+        primer = await run_in_threadpool(
+            generate_primer,
             prompt=req.prompt,
             instrument=instrument,
             bars=primer_bars,
@@ -209,7 +309,8 @@ async def generate(req: GenerateRequest):
     logger.info(f"[{request_id}] Step 2: Post-processing...")
     step_start = time.time()
 
-    processed_notes = post_process(
+    processed_notes = await run_in_threadpool(
+        post_process,
         notes=primer_notes,
         style=req.prompt,
         instrument=instrument,
@@ -220,81 +321,178 @@ async def generate(req: GenerateRequest):
         f"({time.time() - step_start:.2f}s)"
     )
 
-    # --- Step 3: Magenta continuation ---
-    logger.info(f"[{request_id}] Step 3: Magenta continuation...")
-    step_start = time.time()
+    # --- Steps 3-4 run under the generation semaphore ---
+    # TensorFlow models thrash when many generations run at once; extra
+    # requests queue here instead, while /health and Claude calls stay free.
+    if _generation_slots.locked():
+        logger.info(f"[{request_id}] Waiting for a free generation slot...")
 
-    if instrument == "drums":
-        sequence = continuator.continue_drums(
-            primer_notes=processed_notes,
-            total_bars=req.bars,
-            primer_bars=primer_bars,
-            tempo=req.tempo,
-            temperature=req.temperature,
-        )
-    else:
-        sequence = continuator.continue_piano(
-            primer_notes=processed_notes,
-            total_bars=req.bars,
-            primer_bars=primer_bars,
-            tempo=req.tempo,
-            temperature=req.temperature,
+    async with _generation_slots:
+        # --- Step 3: Magenta continuation ---
+        logger.info(f"[{request_id}] Step 3: Magenta continuation...")
+        step_start = time.time()
+
+        if instrument == "drums":
+            sequence = await run_in_threadpool(
+                continuator.continue_drums,
+                primer_notes=processed_notes,
+                total_bars=req.bars,
+                primer_bars=primer_bars,
+                tempo=req.tempo,
+                temperature=req.temperature,
+            )
+        else:
+            sequence = await run_in_threadpool(
+                continuator.continue_piano,
+                primer_notes=processed_notes,
+                total_bars=req.bars,
+                primer_bars=primer_bars,
+                tempo=req.tempo,
+                temperature=req.temperature,
+            )
+
+        if sequence is None:
+            raise HTTPException(status_code=500, detail="Magenta generation returned no output")
+
+        total_notes = len(sequence.notes)
+        generated_notes = total_notes - primer_count
+        duration = sequence.total_time
+
+        logger.info(
+            f"[{request_id}] Continuation: {generated_notes} new notes, "
+            f"{duration:.1f}s total ({time.time() - step_start:.1f}s)"
         )
 
-    if sequence is None:
-        raise HTTPException(status_code=500, detail="Magenta generation returned no output")
+        # --- Step 4: Convert to MIDI ---
+        logger.info(f"[{request_id}] Step 4: Converting to MIDI...")
+
+        filename = f"nextbeat_{instrument}_{request_id}.mid"
+        output_path = os.path.join(settings.output_dir, filename)
 
-    total_notes = len(sequence.notes)
-    generated_notes = total_notes - primer_count
-    duration = sequence.total_time
+        try:
+            midi_bytes = await run_in_threadpool(continuator.sequence_to_midi_bytes, sequence)
+        except Exception as e:
+            logger.error(f"[{request_id}] MIDI conversion failed: {e}")
+            raise HTTPException(status_code=500, detail=f"MIDI conversion error: {str(e)}")
 
+    # Write the file to disk after the response goes out
+    background_tasks.add_task(_save_midi, output_path, midi_bytes)
+
+    total_time = time.time() - pipeline_start
     logger.info(
-        f"[{request_id}] Continuation: {generated_notes} new notes, "
-        f"{duration:.1f}s total ({time.time() - step_start:.1f}s)"
+        f"[{request_id}] Complete! {total_notes} notes, {duration:.1f}s, "
+        f"pipeline took {total_time:.1f}s"
     )
 
-    # --- Step 4: Convert to MIDI ---
-    logger.info(f"[{request_id}] Step 4: Converting to MIDI...")
+    metadata = {
+        "filename": filename,
+        "total_notes": total_notes,
+        "duration_seconds": round(duration, 2),
+        "primer_notes": primer_count,
+        "generated_notes": max(0, generated_notes),
+        "instrument": instrument,
+        "style": req.prompt,
+        "tempo": req.tempo,
+        "bars": req.bars,
+    }
+    if req.use_cache:
+        await result_cache.put(cache_params, midi_bytes, metadata)
+    return midi_bytes, metadata
+
+
+# --- Endpoints ---
+
+@app.get("/health", response_model=HealthResponse)
+async def health():
+    """Check server health, model status, and API connectivity."""
+    return HealthResponse(
+        status="ok",
+        models=continuator.models_status(),
+        claude_api="configured" if settings.anthropic_api_key else "missing",
+        version="1.0.0",
+    )
+
+
+@app.post(
+    "/generate",
+    response_model=GenerateResponse,
+    response_model_exclude_none=True,
+)
+async def generate(req: GenerateRequest, background_tasks: BackgroundTasks):
+    """Generate music from a style prompt.
 
-    filename = f"nextbeat_{instrument}_{request_id}.mid"
-    output_path = os.path.join(settings.output_dir, filename)
+    Runs the full Claude → post-processing → Magenta pipeline and returns
+    the MIDI file base64-encoded inside the JSON response.
+    """
+    midi_bytes, metadata = await _run_pipeline(req, background_tasks)
+    return _build_generate_response(req, midi_bytes, metadata)
+
+
+@app.post(
+    "/generate/fast",
+    response_model=GenerateResponse,
+    response_model_exclude_none=True,
+    openapi_extra={
+        "requestBody": {
+            "content": {"application/json": {"schema": GenerateRequest.model_json_schema()}},
+            "required": True,
+        },
+    },
+)
+async def generate_fast(request: Request, background_tasks: BackgroundTasks):
+    """Same as /generate, but parses the request body in a single pass.
 
+    The raw JSON bytes go straight to Pydantic's Rust validator
+    (model_validate_json) instead of json.loads() followed by validating
+    the resulting dict, trimming per-request parsing overhead.
+    """
     try:
-        continuator.sequence_to_midi_file(sequence, output_path)
+        req = GenerateRequest.model_validate_json(await request.body())
+    except ValidationError as e:
+        # Match the error shape FastAPI produces for a declared body parameter
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+        )
 
-        with open(output_path, "rb") as f:
-            midi_bytes = f.read()
+    midi_bytes, metadata = await _run_pipeline(req, background_tasks)
+    return _build_generate_response(req, midi_bytes, metadata)
 
-        midi_base64 = base64.b64encode(midi_bytes).decode("utf-8")
 
-    except Exception as e:
-        logger.error(f"[{request_id}] MIDI conversion failed: {e}")
-        raise HTTPException(status_code=500, detail=f"MIDI conversion error: {str(e)}")
+@app.post("/generate/midi", response_class=Response)
+async def generate_midi(req: GenerateRequest, background_tasks: BackgroundTasks):
+    """Generate music from a style prompt, returning the raw MIDI file.
 
-    total_time = time.time() - pipeline_start
-    logger.info(
-        f"[{request_id}] Complete! {total_notes} notes, {duration:.1f}s, "
-        f"pipeline took {total_time:.1f}s"
-    )
+    Same pipeline as /generate, but the body is the binary .mid file
+    (no base64 / JSON overhead) and the metadata travels in X-* headers.
+    """
+    midi_bytes, metadata = await _run_pipeline(req, background_tasks)
 
-    return GenerateResponse(
-        midi_base64=midi_base64,
-        filename=filename,
-        total_notes=total_notes,
-        duration_seconds=round(duration, 2),
-        primer_notes=primer_count,
-        generated_notes=max(0, generated_notes),
-        instrument=instrument,
-        style=req.prompt,
-        tempo=req.tempo,
-        bars=req.bars,
-    )
+    headers = {
+        "Content-Disposition": f'attachment; filename="{metadata["filename"]}"',
+        "X-Total-Notes": str(metadata["total_notes"]),
+        "X-Duration-Seconds": f"{metadata['duration_seconds']:.2f}",
+        "X-Primer-Notes": str(metadata["primer_notes"]),
+        "X-Generated-Notes": str(metadata["generated_notes"]),
+        "X-Instrument": metadata["instrument"],
+        "X-Tempo": str(metadata["tempo"]),
+        "X-Bars": str(metadata["bars"]),
+    }
+    return Response(content=midi_bytes, media_type="audio/midi", headers=headers)
 
 
 if __name__ == "__main__":
+    # uvicorn[standard] ships uvloop and httptools; the default "auto" loop/http
+    # settings pick them up. Development keeps a single auto-reloading worker.
+    development = settings.environment == "development"
+    if development:
+        workers = 1
+    else:
+        workers = settings.workers or max(2, (os.cpu_count() or 1) // 2)
+
     uvicorn.run(
         "main:app",
         host=settings.host,
         port=settings.port,
-        reload=settings.environment == "development",
+        reload=development,
+        workers=workers,
     )
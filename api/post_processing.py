@@ -9,19 +9,46 @@ Processing order matters:
 1. Quantize - snap to grid (clean up imprecise LLM timing)
 2. Style transforms - apply intentional deviations (swing, emphasis)
 3. Humanize - add micro-variations (make it feel alive)
+
+Each per-note step is a small kernel that mutates one note dict in place.
+The public list-based transforms wrap a single kernel; post_process()
+chains them so every note is copied and visited only once.
 """
 
 import random
+import re
 import logging
-from copy import deepcopy
+from functools import partial
+from operator import itemgetter
 
 from config import settings
 
 logger = logging.getLogger(__name__)
 
+# Dedicated generator for humanization / ghost notes, so draws go straight to
+# one Random instance instead of through the module-level random functions
+_rng = random.Random()
+
+
+def _apply_to_copies(notes: list[dict], kernel, *args) -> list[dict]:
+    """Copy each note, run a per-note kernel on the copy, return the new list."""
+    result = []
+    for note in notes:
+        n = note.copy()
+        kernel(n, *args)
+        result.append(n)
+    return result
+
 
 # --- Quantization ---
 
+def _quantize_note(n: dict, grid: float) -> None:
+    n["time"] = round(n["time"] / grid) * grid
+    # Also quantize duration if present (piano notes)
+    if "duration" in n:
+        n["duration"] = max(grid, round(n["duration"] / grid) * grid)
+
+
 def quantize_notes(notes: list[dict], grid: float = None) -> list[dict]:
     """Snap all note times to the nearest musical grid position.
 
@@ -35,20 +62,36 @@ def quantize_notes(notes: list[dict], grid: float = None) -> list[dict]:
     if grid is None:
         grid = settings.quantize_grid
 
-    quantized = []
-    for note in notes:
-        n = deepcopy(note)
-        n["time"] = round(n["time"] / grid) * grid
-        # Also quantize duration if present (piano notes)
-        if "duration" in n:
-            n["duration"] = max(grid, round(n["duration"] / grid) * grid)
-        quantized.append(n)
-
-    return quantized
+    return _apply_to_copies(notes, _quantize_note, grid)
 
 
 # --- Style-Specific Transforms ---
 
+# Style kernels classify beat positions in integer 16th-note ticks
+# (tick = round(time * 4)): tick & 3 is the 16th within the beat and
+# tick & 15 the 16th within the bar. Notes more than the kernel's tolerance
+# away from a 16th-note slot are left alone.
+
+def _swing_note(n: dict, ratio: float) -> None:
+    ticks = n["time"] * 4
+    tick = round(ticks)
+    if abs(ticks - tick) >= 0.04:  # Not within 0.01 beats of a 16th
+        return
+
+    sub = tick & 3  # 16th within the beat
+
+    # If this note falls on the upbeat 8th (0.5 within the beat),
+    # shift it forward based on swing ratio
+    if sub == 2:
+        n["time"] = (tick >> 2) + ratio
+
+    # Also handle 16th-note level swing:
+    # The "e" of each beat (0.25) stays, but the "a" (0.75) gets shifted
+    elif sub == 3:
+        # Shift the "a" proportionally
+        n["time"] = (tick >> 2) + 0.5 + (ratio / 2)
+
+
 def apply_swing(notes: list[dict], ratio: float = None) -> list[dict]:
     """Apply swing feel by delaying offbeat notes.
 
@@ -62,6 +105,8 @@ def apply_swing(notes: list[dict], ratio: float = None) -> list[dict]:
     Args:
         notes: Quantized note list
         ratio: Swing ratio (0.5=straight, 0.66=standard, 0.75=hard swing)
+
+    A straight ratio (~0.5) returns the input list itself, without copying.
     """
     if ratio is None:
         ratio = settings.swing_ratio
@@ -69,27 +114,23 @@ def apply_swing(notes: list[dict], ratio: float = None) -> list[dict]:
     if abs(ratio - 0.5) < 0.01:
         return notes  # No swing needed
 
-    swung = []
-    for note in notes:
-        n = deepcopy(note)
-        beat_pos = n["time"] % 1.0  # Position within the beat
+    return _apply_to_copies(notes, _swing_note, ratio)
 
-        # If this note falls on the upbeat 8th (0.5 within the beat),
-        # shift it forward based on swing ratio
-        if abs(beat_pos - 0.5) < 0.01:
-            beat_floor = n["time"] - beat_pos
-            n["time"] = beat_floor + ratio
 
-        # Also handle 16th-note level swing:
-        # The "e" of each beat (0.25) stays, but the "a" (0.75) gets shifted
-        elif abs(beat_pos - 0.75) < 0.01:
-            beat_floor = n["time"] - beat_pos
-            # Shift the "a" proportionally
-            n["time"] = beat_floor + 0.5 + (ratio / 2)
+def _rock_emphasis_note(n: dict, vmin: int, vmax: int) -> None:
+    ticks = n["time"] * 4
+    tick = round(ticks)
+    if abs(ticks - tick) >= 0.04:  # Not within 0.01 beats of a 16th
+        return
 
-        swung.append(n)
+    sub = tick & 15  # 16th within the bar
 
-    return swung
+    # Beats 1 and 3 (0.0 and 2.0) get boosted
+    if sub == 0 or sub == 8:
+        n["velocity"] = min(vmax, int(n["velocity"] * 1.15))
+    # Beats 2 and 4 (1.0 and 3.0) stay or get slightly reduced
+    elif sub == 4 or sub == 12:
+        n["velocity"] = max(vmin, int(n["velocity"] * 0.95))
 
 
 def apply_rock_emphasis(notes: list[dict]) -> list[dict]:
@@ -98,21 +139,12 @@ def apply_rock_emphasis(notes: list[dict]) -> list[dict]:
     Increases velocity on beats 1 and 3, slightly reduces beats 2 and 4
     for a driving feel.
     """
-    emphasized = []
-    for note in notes:
-        n = deepcopy(note)
-        beat_pos = n["time"] % 4.0  # Position within the bar
-
-        # Beats 1 and 3 (0.0 and 2.0) get boosted
-        if abs(beat_pos) < 0.01 or abs(beat_pos - 2.0) < 0.01:
-            n["velocity"] = min(settings.velocity_max, int(n["velocity"] * 1.15))
-        # Beats 2 and 4 (1.0 and 3.0) stay or get slightly reduced
-        elif abs(beat_pos - 1.0) < 0.01 or abs(beat_pos - 3.0) < 0.01:
-            n["velocity"] = max(settings.velocity_min, int(n["velocity"] * 0.95))
-
-        emphasized.append(n)
-
-    return emphasized
+    return _apply_to_copies(
+        notes,
+        _rock_emphasis_note,
+        settings.velocity_min,
+        settings.velocity_max,
+    )
 
 
 def add_funk_ghost_notes(notes: list[dict]) -> list[dict]:
@@ -120,63 +152,100 @@ def add_funk_ghost_notes(notes: list[dict]) -> list[dict]:
 
     Ghost notes are quiet snare hits between main strokes that give
     funk its characteristic pocket feel.
+
+    Returns a new list; the input note dicts are shared with it (only read,
+    never modified) rather than copied.
     """
-    result = deepcopy(notes)
-    new_ghosts = []
+    vmin = settings.velocity_min
+    vmax = settings.velocity_max
 
-    # Find all snare hit times to avoid doubling
-    snare_times = {n["time"] for n in result if n.get("drum") == "snare"}
+    result = list(notes)
+    new_ghosts = []
 
-    # Add ghost notes on 16th-note positions where there's no snare hit
+    # Index snare hits by 16th-note slot to avoid doubling. A candidate slot k
+    # sits at k * 0.25 beats, so a hit within 0.01 beats of it has
+    # |4t - k| < 0.04 — only that slot is marked, making lookups O(1).
+    snare_grid = set()
+    for n in result:
+        if n.get("drum") == "snare":
+            slot = round(n["time"] * 4)
+            if abs(n["time"] * 4 - slot) < 0.04:
+                snare_grid.add(slot)
+
+    # Add ghost notes on 16th-note positions where there's no snare hit.
+    # Slot k sits at k * 0.25 beats; walk every slot up to the last note.
     max_time = max((n["time"] for n in result), default=0)
-    bars = int(max_time / 4.0) + 1
-
-    for bar in range(bars):
-        for sixteenth in range(16):
-            time = bar * 4.0 + sixteenth * 0.25
-            if time > max_time:
-                break
-            # Skip positions that already have a snare hit
-            if any(abs(time - t) < 0.01 for t in snare_times):
-                continue
-            # Add ghost note with ~40% probability on offbeat 16ths
-            beat_sub = sixteenth % 4
-            if beat_sub in (1, 3) and random.random() < 0.4:
-                new_ghosts.append({
-                    "drum": "snare",
-                    "midi_note": 38,
-                    "time": time,
-                    "velocity": random.randint(35, 55),  # Very quiet
-                })
+
+    for k in range(int(max_time * 4) + 1):
+        # Only offbeat 16ths (the "e" and "a" of each beat, k & 3 in (1, 3))
+        if not k & 1:
+            continue
+        # Skip positions that already have a snare hit
+        if k in snare_grid:
+            continue
+        # Add ghost note with ~40% probability
+        if _rng.random() < 0.4:
+            new_ghosts.append({
+                "drum": "snare",
+                "midi_note": 38,
+                "time": k * 0.25,
+                # Very quiet, but never below the configured velocity floor
+                "velocity": max(vmin, min(vmax, _rng.randint(35, 55))),
+            })
 
     result.extend(new_ghosts)
     return result
 
 
+def _reggae_offbeat_note(n: dict, vmin: int, vmax: int) -> None:
+    ticks = n["time"] * 4
+    tick = round(ticks)
+    if abs(ticks - tick) >= 0.4:  # Looser: within 0.1 beats of a 16th
+        return
+
+    sub = tick & 3  # 16th within the beat
+
+    # Boost offbeat notes
+    if sub == 2:
+        n["velocity"] = min(vmax, int(n["velocity"] * 1.2))
+    # Reduce downbeat emphasis
+    elif sub == 0:
+        n["velocity"] = max(vmin, int(n["velocity"] * 0.85))
+
+
 def apply_reggae_offbeat(notes: list[dict]) -> list[dict]:
     """Shift rhythmic emphasis to offbeats for reggae/ska feel.
 
     In reggae, the "skank" guitar/keys emphasize the "and" of each beat.
     For drums, the kick often falls on beat 3 rather than 1.
     """
-    shifted = []
-    for note in notes:
-        n = deepcopy(note)
-        beat_pos = n["time"] % 1.0
+    return _apply_to_copies(
+        notes,
+        _reggae_offbeat_note,
+        settings.velocity_min,
+        settings.velocity_max,
+    )
 
-        # Boost offbeat notes
-        if abs(beat_pos - 0.5) < 0.1:
-            n["velocity"] = min(settings.velocity_max, int(n["velocity"] * 1.2))
-        # Reduce downbeat emphasis
-        elif abs(beat_pos) < 0.1:
-            n["velocity"] = max(settings.velocity_min, int(n["velocity"] * 0.85))
 
-        shifted.append(n)
+# --- Humanization ---
 
-    return shifted
+def _humanize_note(
+    n: dict,
+    timing_amount: float,
+    velocity_amount: int,
+    vmin: int,
+    vmax: int,
+) -> None:
+    # Timing micro-variation (gaussian for more natural distribution)
+    time_offset = _rng.gauss(0, timing_amount / 2)
+    time_offset = max(-timing_amount, min(timing_amount, time_offset))
+    n["time"] = max(0.0, n["time"] + time_offset)
 
+    # Velocity micro-variation: uniform integer in [-amount, amount]. Scaling
+    # random() is about half the cost of randint()'s Python-level checks.
+    vel_offset = int(_rng.random() * (2 * velocity_amount + 1)) - velocity_amount
+    n["velocity"] = max(vmin, min(vmax, n["velocity"] + vel_offset))
 
-# --- Humanization ---
 
 def humanize(
     notes: list[dict],
@@ -193,28 +262,28 @@ def humanize(
         notes: Note list after quantization and style processing
         timing_amount: Max timing offset in beats (default: config's humanize_timing)
         velocity_amount: Max velocity offset (default: config's humanize_velocity)
+
+    When both amounts are zero the input list itself is returned (no copies),
+    so callers must not mutate the result if they still need the original.
+    Nothing is clamped in that case either: velocities outside
+    [velocity_min, velocity_max] and negative times pass through unchanged.
     """
     if timing_amount is None:
         timing_amount = settings.humanize_timing
     if velocity_amount is None:
         velocity_amount = settings.humanize_velocity
 
-    humanized = []
-    for note in notes:
-        n = deepcopy(note)
-
-        # Timing micro-variation (gaussian for more natural distribution)
-        time_offset = random.gauss(0, timing_amount / 2)
-        time_offset = max(-timing_amount, min(timing_amount, time_offset))
-        n["time"] = max(0.0, n["time"] + time_offset)
-
-        # Velocity micro-variation
-        vel_offset = random.randint(-velocity_amount, velocity_amount)
-        n["velocity"] = max(settings.velocity_min, min(settings.velocity_max, n["velocity"] + vel_offset))
+    if timing_amount == 0 and velocity_amount == 0:
+        return notes  # Humanization disabled
 
-        humanized.append(n)
-
-    return humanized
+    return _apply_to_copies(
+        notes,
+        _humanize_note,
+        timing_amount,
+        velocity_amount,
+        settings.velocity_min,
+        settings.velocity_max,
+    )
 
 
 # --- Style Detection and Pipeline ---
@@ -226,22 +295,26 @@ FUNK_STYLES = {"funk", "soul", "motown", "r&b", "neo-soul", "disco"}
 REGGAE_STYLES = {"reggae", "ska", "dub", "dancehall"}
 
 
+def _keyword_pattern(keywords: set[str]) -> re.Pattern:
+    """Compile a keyword set into one case-insensitive substring alternation."""
+    return re.compile("|".join(re.escape(k) for k in sorted(keywords)), re.IGNORECASE)
+
+
+# One compiled pattern per category, checked in precedence order
+# (swing > funk > rock > reggae), so each is a single C-level scan of the prompt
+_STYLE_PATTERNS = (
+    ("swing", _keyword_pattern(SWING_STYLES)),
+    ("funk", _keyword_pattern(FUNK_STYLES)),
+    ("rock", _keyword_pattern(ROCK_STYLES)),
+    ("reggae", _keyword_pattern(REGGAE_STYLES)),
+)
+
+
 def _detect_style_category(style_prompt: str) -> str:
     """Detect which style category a prompt falls into for post-processing."""
-    prompt_lower = style_prompt.lower()
-
-    for keyword in SWING_STYLES:
-        if keyword in prompt_lower:
-            return "swing"
-    for keyword in FUNK_STYLES:
-        if keyword in prompt_lower:
-            return "funk"
-    for keyword in ROCK_STYLES:
-        if keyword in prompt_lower:
-            return "rock"
-    for keyword in REGGAE_STYLES:
-        if keyword in prompt_lower:
-            return "reggae"
+    for category, pattern in _STYLE_PATTERNS:
+        if pattern.search(style_prompt):
+            return category
 
     return "neutral"  # No special style processing
 
@@ -265,38 +338,64 @@ def post_process(
 
     logger.info(f"Post-processing {len(notes)} {instrument} notes for style '{style}'")
 
-    # Step 1: Quantize to grid
-    processed = quantize_notes(notes)
-    logger.debug(f"After quantization: {len(processed)} notes")
-
-    # Step 2: Style-specific transforms
     category = _detect_style_category(style)
     logger.info(f"Detected style category: {category}")
 
-    if category == "swing":
-        processed = apply_swing(processed)
-        logger.debug("Applied swing")
+    # Build the per-note kernel chain: quantize → style transform → humanize
+    # Settings are read once here and bound into the kernels, so the
+    # per-note loop never goes through the Settings object
+    vmin = settings.velocity_min
+    vmax = settings.velocity_max
+
+    kernels = [partial(_quantize_note, grid=settings.quantize_grid)]
 
-    elif category == "rock":
-        processed = apply_rock_emphasis(processed)
-        logger.debug("Applied rock emphasis")
+    if category == "swing":
+        ratio = settings.swing_ratio
+        if abs(ratio - 0.5) >= 0.01:  # 0.5 = straight, no swing needed
+            kernels.append(partial(_swing_note, ratio=ratio))
 
-    elif category == "funk":
-        processed = apply_rock_emphasis(processed)  # Funk also benefits from emphasis
-        if instrument == "drums":
-            processed = add_funk_ghost_notes(processed)
-            logger.debug("Applied funk ghost notes")
+    elif category in ("rock", "funk"):  # Funk also benefits from emphasis
+        kernels.append(partial(_rock_emphasis_note, vmin=vmin, vmax=vmax))
 
     elif category == "reggae":
-        processed = apply_reggae_offbeat(processed)
-        logger.debug("Applied reggae offbeat emphasis")
-
-    # Step 3: Humanize
-    processed = humanize(processed)
-    logger.debug(f"After humanization: {len(processed)} notes")
+        kernels.append(partial(_reggae_offbeat_note, vmin=vmin, vmax=vmax))
+
+    humanize_kernel = partial(
+        _humanize_note,
+        timing_amount=settings.humanize_timing,
+        velocity_amount=settings.humanize_velocity,
+        vmin=vmin,
+        vmax=vmax,
+    )
+
+    # Zero humanize settings drop the kernel (and its random draws) entirely
+    if settings.humanize_timing == 0 and settings.humanize_velocity == 0:
+        humanize_kernel = None
+
+    # Funk ghost notes are placed against the quantized (pre-humanize) grid,
+    # so humanization waits until they've been added
+    ghost_notes = category == "funk" and instrument == "drums"
+    if humanize_kernel is not None and not ghost_notes:
+        kernels.append(humanize_kernel)
+
+    # Single pass: each note is copied once and run through every kernel
+    processed = []
+    for note in notes:
+        n = note.copy()
+        for kernel in kernels:
+            kernel(n)
+        processed.append(n)
+    logger.debug(f"Applied {len(kernels)} per-note steps to {len(processed)} notes")
+
+    if ghost_notes:
+        processed = add_funk_ghost_notes(processed)
+        logger.debug("Applied funk ghost notes")
+        if humanize_kernel is not None:
+            for n in processed:
+                humanize_kernel(n)
 
     # Sort by time for clean output
-    processed.sort(key=lambda n: n["time"])
+    processed.sort(key=itemgetter("time"))
 
     logger.info(f"Post-processing complete: {len(processed)} notes")
     return processed
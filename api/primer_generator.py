@@ -7,16 +7,39 @@ style semantics (what makes jazz "jazzy") and outputs structured JSON that
 the post-processing and Magenta modules can work with.
 """
 
-import json
 import logging
-import re
+from typing import TYPE_CHECKING, Iterator
 
-from anthropic import Anthropic
+import orjson
 
 from config import settings
 
+if TYPE_CHECKING:
+    from anthropic import Anthropic
+
 logger = logging.getLogger(__name__)
 
+# Shared Anthropic client — created on first use, then reused so its
+# connection pool and TLS sessions carry over between requests
+_client = None
+
+
+def _get_client() -> "Anthropic":
+    """Return the shared Anthropic client, creating it on first call.
+
+    anthropic (and httpx under it) is imported here rather than at module
+    level so importing this module for post-processing/validation alone
+    stays cheap.
+    """
+    global _client
+
+    if _client is None:
+        from anthropic import Anthropic
+
+        _client = Anthropic(api_key=settings.anthropic_api_key)
+    return _client
+
+
 # Standard MIDI drum map (General MIDI percussion)
 DRUM_MIDI_MAP = {
     "kick": 36,
@@ -34,14 +57,17 @@ DRUM_MIDI_MAP = {
 }
 
 
-def _build_drum_prompt(style: str, bars: int, tempo: int) -> str:
-    """Build a prompt for Claude to generate drum primer notes."""
-    return f"""You are a professional drummer and music producer. Generate a {bars}-bar drum pattern in the style of "{style}" at {tempo} BPM in 4/4 time.
+# Prompt bodies are static apart from a few request parameters, so they
+# are built once here and filled in with str.format per request.
+# Braces in the JSON examples are doubled to escape them from format().
+_DRUM_KEYS = list(DRUM_MIDI_MAP.keys())
+
+_DRUM_PROMPT_TEMPLATE = """You are a professional drummer and music producer. Generate a {bars}-bar drum pattern in the style of "{style}" at {tempo} BPM in 4/4 time.
 
 Output ONLY a JSON array of note objects. Do NOT wrap in markdown code blocks. Do NOT include any text before or after the JSON.
 
 Each note object must have:
-- "drum": one of {list(DRUM_MIDI_MAP.keys())}
+- "drum": one of {drum_keys}
 - "time": beat position as a float (0.0 = beat 1 of bar 1, 1.0 = beat 2, 4.0 = beat 1 of bar 2, etc.)
 - "velocity": integer 40-120
 
@@ -55,16 +81,13 @@ Style guidelines:
 - Reggae: kick on beats 3 and 4, rimshot on beat 3, hihat steady
 - Pop: four-on-the-floor kick, snare on 2 and 4, hihat eighth notes
 
-Total beats in {bars} bars = {bars * 4}. Keep time values between 0.0 and {bars * 4.0 - 0.25}.
+Total beats in {bars} bars = {total_beats}. Keep time values between 0.0 and {max_time}.
 Make it musically interesting with appropriate fills, ghost notes, and variations for the style.
 
 Example output format:
 [{{"drum": "kick", "time": 0.0, "velocity": 100}}, {{"drum": "hihat", "time": 0.0, "velocity": 70}}, {{"drum": "snare", "time": 1.0, "velocity": 90}}]"""
 
-
-def _build_piano_prompt(style: str, bars: int, tempo: int) -> str:
-    """Build a prompt for Claude to generate piano/melody primer notes."""
-    return f"""You are a professional pianist and composer. Generate a {bars}-bar piano part in the style of "{style}" at {tempo} BPM in 4/4 time.
+_PIANO_PROMPT_TEMPLATE = """You are a professional pianist and composer. Generate a {bars}-bar piano part in the style of "{style}" at {tempo} BPM in 4/4 time.
 
 Output ONLY a JSON array of note objects. Do NOT wrap in markdown code blocks. Do NOT include any text before or after the JSON.
 
@@ -85,12 +108,35 @@ Style guidelines:
 - Rock: power chords, driving eighth-note rhythm, pentatonic riffs
 
 Include both melodic content (single notes) and harmonic content (chords with multiple simultaneous notes at same time).
-Total beats in {bars} bars = {bars * 4}. Keep time values between 0.0 and {bars * 4.0 - 0.25}.
+Total beats in {bars} bars = {total_beats}. Keep time values between 0.0 and {max_time}.
 
 Example output format:
 [{{"pitch": 60, "time": 0.0, "duration": 1.0, "velocity": 80}}, {{"pitch": 64, "time": 0.0, "duration": 1.0, "velocity": 75}}, {{"pitch": 67, "time": 0.0, "duration": 1.0, "velocity": 75}}]"""
 
 
+def _build_drum_prompt(style: str, bars: int, tempo: int) -> str:
+    """Build a prompt for Claude to generate drum primer notes."""
+    return _DRUM_PROMPT_TEMPLATE.format(
+        style=style,
+        bars=bars,
+        tempo=tempo,
+        drum_keys=_DRUM_KEYS,
+        total_beats=bars * 4,
+        max_time=bars * 4.0 - 0.25,
+    )
+
+
+def _build_piano_prompt(style: str, bars: int, tempo: int) -> str:
+    """Build a prompt for Claude to generate piano/melody primer notes."""
+    return _PIANO_PROMPT_TEMPLATE.format(
+        style=style,
+        bars=bars,
+        tempo=tempo,
+        total_beats=bars * 4,
+        max_time=bars * 4.0 - 0.25,
+    )
+
+
 def _extract_json_from_response(text: str) -> list[dict]:
     """Extract JSON array from Claude's response, handling markdown formatting.
 
@@ -100,37 +146,52 @@ def _extract_json_from_response(text: str) -> list[dict]:
     # Try direct parse first
     text = text.strip()
     try:
-        return json.loads(text)
-    except json.JSONDecodeError:
+        return orjson.loads(text)
+    except orjson.JSONDecodeError:
         pass
 
-    # Strip markdown code blocks
-    code_block_match = re.search(r"```(?:json)?\s*\n?(.*?)\n?\s*```", text, re.DOTALL)
-    if code_block_match:
-        try:
-            return json.loads(code_block_match.group(1).strip())
-        except json.JSONDecodeError:
-            pass
+    # Strip markdown code fences: take the body between the first ``` and the
+    # next one, dropping the opening ```json line. Fences are found by
+    # position, so prose before or after the block doesn't matter. Plain
+    # string ops, no backtracking over the whole response.
+    fence_start = text.find("```")
+    if fence_start != -1:
+        body_start = fence_start + 3
+        fence_end = text.find("```", body_start)
+        if fence_end != -1:
+            newline = text.find("\n", body_start, fence_end)
+            if newline != -1:
+                body_start = newline + 1
+            elif text.startswith("json", body_start):
+                body_start += 4  # Single-line ```json [...]```
+            try:
+                return orjson.loads(text[body_start:fence_end].strip())
+            except orjson.JSONDecodeError:
+                pass
 
     # Find the outermost JSON array
     bracket_start = text.find("[")
     bracket_end = text.rfind("]")
     if bracket_start != -1 and bracket_end != -1 and bracket_end > bracket_start:
         try:
-            return json.loads(text[bracket_start : bracket_end + 1])
-        except json.JSONDecodeError:
+            return orjson.loads(text[bracket_start : bracket_end + 1])
+        except orjson.JSONDecodeError:
             pass
 
     raise ValueError(f"Could not extract valid JSON from Claude response:\n{text[:500]}")
 
 
-def _validate_drum_notes(notes: list[dict], max_time: float) -> list[dict]:
-    """Validate and clean drum note data from Claude."""
-    validated = []
+def _validate_drum_notes(notes: list[dict], max_time: float) -> Iterator[dict]:
+    """Validate and clean drum note data from Claude, yielding notes lazily."""
+    vmin = settings.velocity_min
+    vmax = settings.velocity_max
+
     for note in notes:
         drum = note.get("drum", "")
-        if drum not in DRUM_MIDI_MAP:
-            logger.warning(f"Unknown drum '{drum}', skipping")
+        midi_note = DRUM_MIDI_MAP.get(drum)
+        if midi_note is None:
+            if logger.isEnabledFor(logging.WARNING):
+                logger.warning(f"Unknown drum '{drum}', skipping")
             continue
 
         time = float(note.get("time", 0))
@@ -138,21 +199,21 @@ def _validate_drum_notes(notes: list[dict], max_time: float) -> list[dict]:
 
         # Clamp values
         time = max(0.0, min(time, max_time))
-        velocity = max(settings.velocity_min, min(velocity, settings.velocity_max))
+        velocity = max(vmin, min(velocity, vmax))
 
-        validated.append({
+        yield {
             "drum": drum,
-            "midi_note": DRUM_MIDI_MAP[drum],
+            "midi_note": midi_note,
             "time": time,
             "velocity": velocity,
-        })
+        }
 
-    return validated
 
+def _validate_piano_notes(notes: list[dict], max_time: float) -> Iterator[dict]:
+    """Validate and clean piano note data from Claude, yielding notes lazily."""
+    vmin = settings.velocity_min
+    vmax = settings.velocity_max
 
-def _validate_piano_notes(notes: list[dict], max_time: float) -> list[dict]:
-    """Validate and clean piano note data from Claude."""
-    validated = []
     for note in notes:
         pitch = int(note.get("pitch", 60))
         time = float(note.get("time", 0))
@@ -163,16 +224,14 @@ def _validate_piano_notes(notes: list[dict], max_time: float) -> list[dict]:
         pitch = max(21, min(pitch, 108))  # Piano range A0-C8
         time = max(0.0, min(time, max_time))
         duration = max(0.125, min(duration, 8.0))  # 32nd note to 2 bars
-        velocity = max(settings.velocity_min, min(velocity, settings.velocity_max))
+        velocity = max(vmin, min(velocity, vmax))
 
-        validated.append({
+        yield {
             "pitch": pitch,
             "time": time,
             "duration": duration,
             "velocity": velocity,
-        })
-
-    return validated
+        }
 
 
 def generate_primer(
@@ -202,7 +261,7 @@ def generate_primer(
             "Get a key at https://console.anthropic.com/settings/keys"
         )
 
-    client = Anthropic(api_key=settings.anthropic_api_key)
+    client = _get_client()
 
     is_drums = instrument.lower() in ("drums", "percussion", "drum")
     if is_drums:
@@ -227,9 +286,9 @@ def generate_primer(
     max_time = bars * 4.0 - 0.25  # Max beat position
 
     if is_drums:
-        notes = _validate_drum_notes(raw_notes, max_time)
+        notes = list(_validate_drum_notes(raw_notes, max_time))
     else:
-        notes = _validate_piano_notes(raw_notes, max_time)
+        notes = list(_validate_piano_notes(raw_notes, max_time))
 
     if not notes:
         raise ValueError(
@@ -0,0 +1,112 @@
+"""
+Generation Result Cache.
+
+Optional Redis-backed cache for generation results, keyed by a hash of the
+request parameters. Requests that set use_cache and match a stored
+prompt/bars/tempo/temperature/instrument get the stored MIDI back instead of
+re-running the Claude + post-processing + Magenta pipeline (seconds to
+minutes). It is opt-in per request because the pipeline is random, and
+callers without the flag always get a fresh piece.
+
+Disabled unless REDIS_URL is set. redis is an optional dependency — the
+server runs without it, it just never caches.
+"""
+
+import base64
+import hashlib
+import logging
+from typing import Optional
+
+import orjson
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Shared async Redis client — connected once at startup
+_client = None
+
+
+async def connect() -> bool:
+    """Connect to Redis if REDIS_URL is configured. Returns True if caching is enabled."""
+    global _client
+
+    if not settings.redis_url:
+        return False
+
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        logger.warning(
+            "REDIS_URL is set but redis is not installed. Install with: pip install redis"
+        )
+        return False
+
+    try:
+        client = redis.from_url(settings.redis_url)
+        await client.ping()
+    except Exception as e:
+        logger.warning(f"Redis unavailable at {settings.redis_url}, result cache disabled: {e}")
+        return False
+
+    _client = client
+    return True
+
+
+async def close():
+    """Close the Redis connection pool on shutdown."""
+    global _client
+
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _cache_key(params: dict) -> str:
+    """Stable key for a request: blake2b over the canonical (sorted-key) JSON."""
+    payload = orjson.dumps(params, option=orjson.OPT_SORT_KEYS)
+    return "gen:" + hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+async def get(params: dict) -> Optional[tuple[bytes, dict]]:
+    """Look up a cached result.
+
+    Args:
+        params: The request parameters (GenerateRequest.model_dump())
+
+    Returns:
+        (midi_bytes, metadata) on a hit, None on a miss or if caching is off.
+    """
+    if _client is None:
+        return None
+
+    try:
+        raw = await _client.get(_cache_key(params))
+        if raw is None:
+            return None
+
+        # A corrupt or old-format entry counts as a miss
+        entry = orjson.loads(raw)
+        return base64.b64decode(entry["midi_base64"]), entry["metadata"]
+    except Exception as e:
+        logger.warning(f"Result cache lookup failed: {e}")
+        return None
+
+
+async def put(params: dict, midi_bytes: bytes, metadata: dict):
+    """Store a result for settings.cache_ttl_seconds. No-op if caching is off."""
+    if _client is None:
+        return
+
+    entry = {
+        "midi_base64": base64.b64encode(midi_bytes).decode("ascii"),
+        "metadata": metadata,
+    }
+    try:
+        await _client.set(
+            _cache_key(params),
+            orjson.dumps(entry),
+            ex=settings.cache_ttl_seconds,
+        )
+    except Exception as e:
+        logger.warning(f"Result cache store failed: {e}")